@@ -0,0 +1,9 @@
+import httpx
+
+_HEADERS = {"Accept": "application/vnd.github+json"}
+_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+_TIMEOUT = 30
+
+# Shared by all GitHub API calls so TCP/TLS connections are reused.
+client = httpx.Client(http2=True, timeout=_TIMEOUT, limits=_LIMITS, headers=_HEADERS)
+
@@ -1,55 +1,67 @@
 import argparse
-import asyncio
-import json
 import logging
 import sys
 
-from .github_app import get_github_client, get_installation_id, get_installation_token
-from .graphql import get_review_threads, resolve_all_threads
-from .reviewer import run_review
+# Heavy dependencies (PyGithub, PyJWT, httpx) are imported inside the commands
+# that need them to keep CLI startup fast.
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 def _get_client(repo: str):
+    from .github_app import get_github_client, get_installation_id
+
     installation_id = get_installation_id(repo)
     return get_github_client(installation_id), installation_id
 
 
+def _get_token(repo: str) -> str:
+    from .github_app import get_installation_id, get_installation_token
+
+    return get_installation_token(get_installation_id(repo))
+
+
 def cmd_comment(args: argparse.Namespace) -> None:
     gh, _ = _get_client(args.repo)
-    repo = gh.get_repo(args.repo)
+    repo = gh.get_repo(args.repo, lazy=True)
     pr = repo.get_pull(args.pr)
     pr.create_issue_comment(args.message)
     logger.info("Commented on %s#%d", args.repo, args.pr)
 
 
 def cmd_review(args: argparse.Namespace) -> None:
-    gh, installation_id = _get_client(args.repo)
-    repo = gh.get_repo(args.repo)
-    pr = repo.get_pull(args.pr)
+    import asyncio
 
-    token = get_installation_token(installation_id)
-    clone_url = repo.clone_url
-    head_sha = pr.head.sha
+    from .graphql import get_pull_request_head
+    from .reviewer import run_review
+
+    token = _get_token(args.repo)
+    owner, repo_name = args.repo.split("/")
+    head = get_pull_request_head(token, owner, repo_name, args.pr)
 
-    review_text = asyncio.run(run_review(clone_url, head_sha, token))
+    review_text = asyncio.run(
+        run_review(args.repo, args.pr, head.clone_url, head.head_sha, token)
+    )
     print(review_text)
 
 
 def cmd_comments(args: argparse.Namespace) -> None:
-    gh, _ = _get_client(args.repo)
-    repo = gh.get_repo(args.repo)
-    pr = repo.get_pull(args.pr)
-    for c in pr.get_issue_comments():
-        print(f"--- {c.user.login} ({c.created_at}) ---")
+    from .graphql import list_issue_comments
+
+    token = _get_token(args.repo)
+    owner, repo_name = args.repo.split("/")
+    for c in list_issue_comments(token, owner, repo_name, args.pr):
+        print(f"--- {c.author} ({c.created_at}) ---")
         print(c.body)
         print()
 
 
 def cmd_approve(args: argparse.Namespace) -> None:
-    _, installation_id = _get_client(args.repo)
+    from .github_app import get_github_client, get_installation_id, get_installation_token
+    from .graphql import resolve_all_threads
+
+    installation_id = get_installation_id(args.repo)
     token = get_installation_token(installation_id)
     owner, repo_name = args.repo.split("/")
 
@@ -58,7 +70,7 @@ def cmd_approve(args: argparse.Namespace) -> None:
         logger.info("Resolved %d threads before approving", resolved)
 
     gh = get_github_client(installation_id)
-    repo = gh.get_repo(args.repo)
+    repo = gh.get_repo(args.repo, lazy=True)
     pr = repo.get_pull(args.pr)
 
     kwargs = {"event": "APPROVE"}
@@ -70,15 +82,16 @@ def cmd_approve(args: argparse.Namespace) -> None:
 
 def cmd_reply_comment(args: argparse.Namespace) -> None:
     gh, _ = _get_client(args.repo)
-    repo = gh.get_repo(args.repo)
+    repo = gh.get_repo(args.repo, lazy=True)
     pr = repo.get_pull(args.pr)
     pr.create_review_comment_reply(args.comment_id, args.message)
     logger.info("Replied to comment %d on %s#%d", args.comment_id, args.repo, args.pr)
 
 
 def cmd_review_comments(args: argparse.Namespace) -> None:
-    _, installation_id = _get_client(args.repo)
-    token = get_installation_token(installation_id)
+    from .graphql import get_review_threads
+
+    token = _get_token(args.repo)
     owner, repo_name = args.repo.split("/")
 
     threads = get_review_threads(token, owner, repo_name, args.pr)
@@ -100,8 +113,10 @@ def cmd_review_comments(args: argparse.Namespace) -> None:
 
 
 def cmd_submit_review(args: argparse.Namespace) -> None:
+    import json
+
     gh, _ = _get_client(args.repo)
-    repo = gh.get_repo(args.repo)
+    repo = gh.get_repo(args.repo, lazy=True)
     pr = repo.get_pull(args.pr)
 
     review_data = json.loads(args.review_json)
@@ -117,56 +132,77 @@ def cmd_submit_review(args: argparse.Namespace) -> None:
     logger.info("Submitted %s review on %s#%d", args.event, args.repo, args.pr)
 
 
-def main() -> None:
+_REPO = ("repo", {"help": "Repository full name (owner/repo)"})
+_PR = ("pr", {"type": int, "help": "PR number"})
+
+# command -> (handler, help, positional arguments as (dest, add_argument kwargs))
+COMMANDS = {
+    "comment": (cmd_comment, "Post a comment on a PR", [
+        _REPO, _PR, ("message", {"help": "Comment text"}),
+    ]),
+    "review": (cmd_review, "Run Claude review on a PR", [_REPO, _PR]),
+    "comments": (cmd_comments, "Show PR issue comments", [_REPO, _PR]),
+    "approve": (cmd_approve, "Approve a PR (resolves all threads first)", [
+        _REPO, _PR,
+        ("message", {"nargs": "?", "default": "", "help": "Optional approval message"}),
+    ]),
+    "reply-comment": (cmd_reply_comment, "Reply to a review comment", [
+        _REPO, _PR,
+        ("comment_id", {"type": int, "help": "Review comment database ID"}),
+        ("message", {"help": "Reply text"}),
+    ]),
+    "review-comments": (cmd_review_comments, "Show review threads", [_REPO, _PR]),
+    "submit-review": (cmd_submit_review, "Submit a review with inline comments", [
+        _REPO, _PR,
+        ("event", {"choices": ["COMMENT", "REQUEST_CHANGES"], "help": "Review event type"}),
+        ("review_json", {"help": 'JSON: {"body": "...", "comments": [{"path": "...", "line": N, "body": "..."}]}'}),
+    ]),
+}
+
+
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Agent Fedor CLI")
     sub = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text, params) in COMMANDS.items():
+        p = sub.add_parser(name, help=help_text)
+        for dest, opts in params:
+            p.add_argument(dest, **opts)
+    return parser
+
+
+def _parse_fast(argv: list[str]) -> argparse.Namespace | None:
+    """Parse plain positional arguments without building the argparse parser.
+
+    Returns None for anything else (flags, unknown commands, bad values) so
+    argparse handles it and produces its usual help and error messages.
+    """
+    if not argv or argv[0] not in COMMANDS or any(a.startswith("-") for a in argv):
+        return None
+    params = COMMANDS[argv[0]][2]
+    values = argv[1:]
+    required = sum(1 for _, opts in params if opts.get("nargs") != "?")
+    if not required <= len(values) <= len(params):
+        return None
+
+    args = argparse.Namespace(command=argv[0])
+    for i, (dest, opts) in enumerate(params):
+        if i >= len(values):
+            setattr(args, dest, opts["default"])
+            continue
+        try:
+            value = opts.get("type", str)(values[i])
+        except ValueError:
+            return None
+        if value not in opts.get("choices", (value,)):
+            return None
+        setattr(args, dest, value)
+    return args
 
-    p_comment = sub.add_parser("comment", help="Post a comment on a PR")
-    p_comment.add_argument("repo", help="Repository full name (owner/repo)")
-    p_comment.add_argument("pr", type=int, help="PR number")
-    p_comment.add_argument("message", help="Comment text")
-
-    p_review = sub.add_parser("review", help="Run Claude review on a PR")
-    p_review.add_argument("repo", help="Repository full name (owner/repo)")
-    p_review.add_argument("pr", type=int, help="PR number")
-
-    p_comments = sub.add_parser("comments", help="Show PR issue comments")
-    p_comments.add_argument("repo", help="Repository full name (owner/repo)")
-    p_comments.add_argument("pr", type=int, help="PR number")
-
-    p_approve = sub.add_parser("approve", help="Approve a PR (resolves all threads first)")
-    p_approve.add_argument("repo", help="Repository full name (owner/repo)")
-    p_approve.add_argument("pr", type=int, help="PR number")
-    p_approve.add_argument("message", nargs="?", default="", help="Optional approval message")
-
-    p_reply = sub.add_parser("reply-comment", help="Reply to a review comment")
-    p_reply.add_argument("repo", help="Repository full name (owner/repo)")
-    p_reply.add_argument("pr", type=int, help="PR number")
-    p_reply.add_argument("comment_id", type=int, help="Review comment database ID")
-    p_reply.add_argument("message", help="Reply text")
-
-    p_review_comments = sub.add_parser("review-comments", help="Show review threads")
-    p_review_comments.add_argument("repo", help="Repository full name (owner/repo)")
-    p_review_comments.add_argument("pr", type=int, help="PR number")
-
-    p_submit = sub.add_parser("submit-review", help="Submit a review with inline comments")
-    p_submit.add_argument("repo", help="Repository full name (owner/repo)")
-    p_submit.add_argument("pr", type=int, help="PR number")
-    p_submit.add_argument("event", choices=["COMMENT", "REQUEST_CHANGES"], help="Review event type")
-    p_submit.add_argument("review_json", help='JSON: {"body": "...", "comments": [{"path": "...", "line": N, "body": "..."}]}')
-
-    args = parser.parse_args()
-    commands = {
-        "comment": cmd_comment,
-        "review": cmd_review,
-        "comments": cmd_comments,
-        "approve": cmd_approve,
-        "reply-comment": cmd_reply_comment,
-        "review-comments": cmd_review_comments,
-        "submit-review": cmd_submit_review,
-    }
+
+def main() -> None:
+    args = _parse_fast(sys.argv[1:]) or _build_parser().parse_args()
     try:
-        commands[args.command](args)
+        COMMANDS[args.command][0](args)
     except Exception:
         logger.exception("Command failed")
         sys.exit(1)
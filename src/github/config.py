@@ -1,7 +1,11 @@
 import os
 from dataclasses import dataclass, field
+from functools import cached_property
 from pathlib import Path
 
+from cryptography.hazmat.primitives.asymmetric.types import PrivateKeyTypes
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
 
 @dataclass
 class Settings:
@@ -33,10 +37,24 @@ class Settings:
     github_pr_label: str = field(
         default_factory=lambda: os.environ.get("GITHUB_PR_LABEL", "fedor-review")
     )
+    max_concurrent_reviews: int = field(
+        default_factory=lambda: int(os.environ.get("MAX_CONCURRENT_REVIEWS", "4"))
+    )
+    required_labels: frozenset[str] = field(init=False)
 
-    @property
+    def __post_init__(self) -> None:
+        self.required_labels = frozenset(
+            label.strip() for label in self.github_pr_label.split(",") if label.strip()
+        )
+
+    @cached_property
     def github_private_key(self) -> str:
         return self.github_private_key_path.read_text()
 
+    @cached_property
+    def github_signing_key(self) -> PrivateKeyTypes:
+        """The app private key, parsed once so JWT signing skips PEM decoding."""
+        return load_pem_private_key(self.github_private_key.encode(), password=None)
+
 
 settings = Settings()
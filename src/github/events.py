@@ -0,0 +1,56 @@
+import msgspec
+
+# Only the webhook fields the server reads are declared; msgspec skips
+# everything else in the payload without building objects for it.
+
+
+class Label(msgspec.Struct):
+    name: str
+
+
+class User(msgspec.Struct):
+    login: str
+
+
+class Repository(msgspec.Struct):
+    full_name: str
+
+
+class PullRequest(msgspec.Struct):
+    number: int
+    labels: list[Label] = []
+
+
+class IssuePullRequest(msgspec.Struct):
+    """Present on issues that are pull requests; its fields are not needed."""
+
+
+class Issue(msgspec.Struct):
+    number: int
+    labels: list[Label] = []
+    pull_request: IssuePullRequest | None = None
+
+
+class Comment(msgspec.Struct):
+    user: User
+
+
+class Review(msgspec.Struct):
+    user: User
+    state: str = ""
+
+
+class WebhookEvent(msgspec.Struct):
+    action: str | None = None
+    repository: Repository | None = None
+    pull_request: PullRequest | None = None
+    issue: Issue | None = None
+    comment: Comment | None = None
+    review: Review | None = None
+
+
+_decoder = msgspec.json.Decoder(WebhookEvent)
+
+
+def decode_event(payload: bytes) -> WebhookEvent:
+    return _decoder.decode(payload)
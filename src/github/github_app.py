@@ -1,51 +1,93 @@
 import time
+from datetime import datetime
 
-import httpx
 import jwt
 from github import Auth, Github
 
+from ._http import client
 from .config import settings
 
 GITHUB_API_URL = "https://api.github.com"
 
+JWT_LIFETIME = 600
+# Refresh cached credentials this many seconds before they actually expire.
+JWT_REFRESH_MARGIN = 60
+TOKEN_REFRESH_MARGIN = 600
+
+# repo full name -> installation ID (stable for the lifetime of the install)
+_installation_ids: dict[str, int] = {}
+# installation ID -> (token, refresh-after unix time)
+_installation_tokens: dict[int, tuple[str, float]] = {}
+# installation ID -> (client, the installation token it authenticates with)
+_github_clients: dict[int, tuple[Github, str]] = {}
+# (jwt, expiry unix time)
+_app_jwt: tuple[str, float] | None = None
+
 
 def _generate_jwt() -> str:
+    global _app_jwt
     now = int(time.time())
+    if _app_jwt and now < _app_jwt[1] - JWT_REFRESH_MARGIN:
+        return _app_jwt[0]
+
+    exp = now + JWT_LIFETIME
     payload = {
         "iat": now - 60,
-        "exp": now + 600,
+        "exp": exp,
         "iss": str(settings.github_app_id),
     }
-    return jwt.encode(payload, settings.github_private_key, algorithm="RS256")
+    token = jwt.encode(payload, settings.github_signing_key, algorithm="RS256")
+    _app_jwt = (token, exp)
+    return token
 
 
 def get_installation_token(installation_id: int) -> str:
+    cached = _installation_tokens.get(installation_id)
+    if cached and time.time() < cached[1]:
+        return cached[0]
+
     token = _generate_jwt()
-    resp = httpx.post(
+    resp = client.post(
         f"{GITHUB_API_URL}/app/installations/{installation_id}/access_tokens",
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/vnd.github+json",
-        },
+        headers={"Authorization": f"Bearer {token}"},
     )
     resp.raise_for_status()
-    return resp.json()["token"]
+    data = resp.json()
+    if "expires_at" in data:
+        expires_at = datetime.fromisoformat(data["expires_at"]).timestamp()
+    else:
+        expires_at = time.time() + 3600
+    _installation_tokens[installation_id] = (
+        data["token"], expires_at - TOKEN_REFRESH_MARGIN,
+    )
+    return data["token"]
 
 
 def get_installation_id(repo_full_name: str) -> int:
+    cached = _installation_ids.get(repo_full_name)
+    if cached is not None:
+        return cached
+
     token = _generate_jwt()
-    resp = httpx.get(
+    resp = client.get(
         f"{GITHUB_API_URL}/repos/{repo_full_name}/installation",
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/vnd.github+json",
-        },
+        headers={"Authorization": f"Bearer {token}"},
     )
     resp.raise_for_status()
-    return resp.json()["id"]
+    installation_id = resp.json()["id"]
+    _installation_ids[repo_full_name] = installation_id
+    return installation_id
 
 
 def get_github_client(installation_id: int) -> Github:
     token = get_installation_token(installation_id)
+    cached = _github_clients.get(installation_id)
+    if cached and cached[1] == token:
+        return cached[0]
+    if cached:
+        cached[0].close()
+
     auth = Auth.Token(token)
-    return Github(auth=auth)
+    gh = Github(auth=auth)
+    _github_clients[installation_id] = (gh, token)
+    return gh
@@ -1,8 +1,13 @@
 import logging
+import time
 from dataclasses import dataclass
+from datetime import datetime
+from email.utils import parsedate_to_datetime
 
 import httpx
 
+from ._http import client
+
 logger = logging.getLogger(__name__)
 
 GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
@@ -25,16 +30,50 @@ class ReviewThread:
     comments: list[ThreadComment]
 
 
-def _graphql(token: str, query: str, variables: dict | None = None) -> dict:
-    resp = httpx.post(
-        GITHUB_GRAPHQL_URL,
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/vnd.github+json",
-        },
-        json={"query": query, "variables": variables or {}},
-        timeout=30,
-    )
+@dataclass
+class IssueComment:
+    database_id: int
+    author: str
+    body: str
+    created_at: str
+
+
+@dataclass
+class PullRequestHead:
+    clone_url: str
+    head_sha: str
+
+
+MAX_ATTEMPTS = 3
+# The CLI runs inside an agent session with its own timeout, so longer
+# rate-limit waits fail instead of blocking.
+MAX_RETRY_DELAY = 60
+
+
+def _retry_delay(resp: httpx.Response) -> float | None:
+    """Seconds to wait before retrying a rate-limited response, or None."""
+    if resp.status_code not in (403, 429):
+        return None
+    retry_after = resp.headers.get("retry-after")
+    if retry_after is not None:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+    if resp.headers.get("x-ratelimit-remaining") == "0":
+        try:
+            reset = float(resp.headers.get("x-ratelimit-reset", ""))
+        except ValueError:
+            return None
+        return max(reset - time.time(), 1.0)
+    return None
+
+
+def _graphql_data(resp: httpx.Response) -> dict:
     resp.raise_for_status()
     data = resp.json()
     if "errors" in data:
@@ -42,75 +81,250 @@ def _graphql(token: str, query: str, variables: dict | None = None) -> dict:
     return data["data"]
 
 
+def _graphql(token: str, query: str, variables: dict | None = None) -> dict:
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        resp = client.post(
+            GITHUB_GRAPHQL_URL,
+            headers={"Authorization": f"Bearer {token}"},
+            json={"query": query, "variables": variables or {}},
+        )
+        delay = _retry_delay(resp)
+        if delay is None or attempt == MAX_ATTEMPTS:
+            break
+        if delay > MAX_RETRY_DELAY:
+            raise RuntimeError(f"GitHub rate limit resets in {delay:.0f}s, not waiting")
+        logger.warning("Rate limited by GitHub, retrying in %.0fs", delay)
+        time.sleep(delay)
+    return _graphql_data(resp)
+
+
+THREAD_CORE_FRAGMENT = """
+fragment threadCore on PullRequestReviewThread {
+  id
+  isResolved
+}
+"""
+
+THREAD_COMMENT_FRAGMENT = """
+fragment threadComment on PullRequestReviewComment {
+  databaseId
+  author { __typename login }
+  body
+}
+"""
+
 REVIEW_THREADS_QUERY = """
-query($owner: String!, $repo: String!, $pr: Int!) {
+query($owner: String!, $repo: String!, $pr: Int!, $cursor: String) {
   repository(owner: $owner, name: $repo) {
     pullRequest(number: $pr) {
-      reviewThreads(first: 100) {
+      reviewThreads(first: 100, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
         nodes {
-          id
-          isResolved
+          ...threadCore
           isOutdated
           path
           line
           comments(first: 100) {
-            nodes {
-              databaseId
-              author { login }
-              body
-            }
+            pageInfo { hasNextPage endCursor }
+            nodes { ...threadComment }
           }
         }
       }
     }
   }
 }
-"""
+""" + THREAD_CORE_FRAGMENT + THREAD_COMMENT_FRAGMENT
+
+# Only what resolve_all_threads needs, to keep approve's payload small.
+UNRESOLVED_THREAD_IDS_QUERY = """
+query($owner: String!, $repo: String!, $pr: Int!, $cursor: String) {
+  repository(owner: $owner, name: $repo) {
+    pullRequest(number: $pr) {
+      reviewThreads(first: 100, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { ...threadCore }
+      }
+    }
+  }
+}
+""" + THREAD_CORE_FRAGMENT
+
+THREAD_COMMENTS_QUERY = """
+query($id: ID!, $cursor: String) {
+  node(id: $id) {
+    ... on PullRequestReviewThread {
+      comments(first: 100, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { ...threadComment }
+      }
+    }
+  }
+}
+""" + THREAD_COMMENT_FRAGMENT
+
+
+def _rest_login(author: dict | None) -> str:
+    # GraphQL drops the "[bot]" suffix that REST logins carry for apps.
+    if not author:
+        return "ghost"
+    if author["__typename"] == "Bot":
+        return f"{author['login']}[bot]"
+    return author["login"]
+
+
+def _parse_thread(node: dict, extra_comments: list[dict]) -> ReviewThread:
+    comments = [
+        ThreadComment(
+            database_id=c["databaseId"],
+            author=_rest_login(c["author"]),
+            body=c["body"],
+        )
+        for c in node["comments"]["nodes"] + extra_comments
+    ]
+    return ReviewThread(
+        id=node["id"],
+        is_resolved=node["isResolved"],
+        is_outdated=node["isOutdated"],
+        path=node["path"],
+        line=node["line"],
+        comments=comments,
+    )
 
 
 def get_review_threads(
     token: str, owner: str, repo: str, pr: int
 ) -> list[ReviewThread]:
-    data = _graphql(token, REVIEW_THREADS_QUERY, {
-        "owner": owner, "repo": repo, "pr": pr,
-    })
-    threads = []
-    for node in data["repository"]["pullRequest"]["reviewThreads"]["nodes"]:
-        comments = [
-            ThreadComment(
+    """Fetch all review threads, paging threads and their comments."""
+    extra_comments: dict[str, list[dict]] = {}
+    nodes = []
+    cursor = None
+    while True:
+        data = _graphql(token, REVIEW_THREADS_QUERY, {
+            "owner": owner, "repo": repo, "pr": pr, "cursor": cursor,
+        })
+        page = data["repository"]["pullRequest"]["reviewThreads"]
+        for node in page["nodes"]:
+            comments_page = node["comments"]
+            while comments_page["pageInfo"]["hasNextPage"]:
+                comments_data = _graphql(token, THREAD_COMMENTS_QUERY, {
+                    "id": node["id"],
+                    "cursor": comments_page["pageInfo"]["endCursor"],
+                })
+                comments_page = comments_data["node"]["comments"]
+                extra_comments.setdefault(node["id"], []).extend(comments_page["nodes"])
+        nodes.extend(page["nodes"])
+        if not page["pageInfo"]["hasNextPage"]:
+            break
+        cursor = page["pageInfo"]["endCursor"]
+
+    return [_parse_thread(node, extra_comments.get(node["id"], [])) for node in nodes]
+
+
+ISSUE_COMMENTS_QUERY = """
+query($owner: String!, $repo: String!, $pr: Int!, $cursor: String) {
+  repository(owner: $owner, name: $repo) {
+    pullRequest(number: $pr) {
+      comments(first: 100, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes {
+          databaseId
+          author { __typename login }
+          body
+          createdAt
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def list_issue_comments(
+    token: str, owner: str, repo: str, pr: int
+) -> list[IssueComment]:
+    comments = []
+    cursor = None
+    while True:
+        data = _graphql(token, ISSUE_COMMENTS_QUERY, {
+            "owner": owner, "repo": repo, "pr": pr, "cursor": cursor,
+        })
+        page = data["repository"]["pullRequest"]["comments"]
+        comments.extend(
+            IssueComment(
                 database_id=c["databaseId"],
-                author=c["author"]["login"] if c["author"] else "ghost",
+                author=_rest_login(c["author"]),
                 body=c["body"],
+                # Same format as the PyGithub datetime printed before.
+                created_at=str(datetime.fromisoformat(c["createdAt"])),
             )
-            for c in node["comments"]["nodes"]
-        ]
-        threads.append(ReviewThread(
-            id=node["id"],
-            is_resolved=node["isResolved"],
-            is_outdated=node["isOutdated"],
-            path=node["path"],
-            line=node["line"],
-            comments=comments,
-        ))
-    return threads
-
-
-RESOLVE_THREAD_MUTATION = """
-mutation($threadId: ID!) {
-  resolveReviewThread(input: {threadId: $threadId}) {
-    thread { isResolved }
+            for c in page["nodes"]
+        )
+        if not page["pageInfo"]["hasNextPage"]:
+            return comments
+        cursor = page["pageInfo"]["endCursor"]
+
+
+PULL_REQUEST_HEAD_QUERY = """
+query($owner: String!, $repo: String!, $pr: Int!) {
+  repository(owner: $owner, name: $repo) {
+    url
+    pullRequest(number: $pr) { headRefOid }
   }
 }
 """
 
 
+def get_pull_request_head(
+    token: str, owner: str, repo: str, pr: int
+) -> PullRequestHead:
+    data = _graphql(token, PULL_REQUEST_HEAD_QUERY, {
+        "owner": owner, "repo": repo, "pr": pr,
+    })
+    repository = data["repository"]
+    return PullRequestHead(
+        clone_url=f"{repository['url']}.git",
+        head_sha=repository["pullRequest"]["headRefOid"],
+    )
+
+
+# Unresolved threads are resolved in batches of aliased mutations, one
+# request per batch, to stay well under GitHub's per-request node limits.
+RESOLVE_BATCH_SIZE = 50
+
+
+def _resolve_threads_mutation(count: int) -> str:
+    params = ", ".join(f"$t{i}: ID!" for i in range(count))
+    fields = "\n".join(
+        f"  r{i}: resolveReviewThread(input: {{threadId: $t{i}}}) {{ thread {{ isResolved }} }}"
+        for i in range(count)
+    )
+    return f"mutation({params}) {{\n{fields}\n}}\n"
+
+
+def _unresolved_thread_ids(token: str, owner: str, repo: str, pr: int) -> list[str]:
+    ids = []
+    cursor = None
+    while True:
+        data = _graphql(token, UNRESOLVED_THREAD_IDS_QUERY, {
+            "owner": owner, "repo": repo, "pr": pr, "cursor": cursor,
+        })
+        page = data["repository"]["pullRequest"]["reviewThreads"]
+        ids.extend(node["id"] for node in page["nodes"] if not node["isResolved"])
+        if not page["pageInfo"]["hasNextPage"]:
+            return ids
+        cursor = page["pageInfo"]["endCursor"]
+
+
 def resolve_all_threads(token: str, owner: str, repo: str, pr: int) -> int:
-    threads = get_review_threads(token, owner, repo, pr)
-    resolved = 0
-    for t in threads:
-        if not t.is_resolved:
-            _graphql(token, RESOLVE_THREAD_MUTATION, {"threadId": t.id})
-            resolved += 1
+    unresolved = _unresolved_thread_ids(token, owner, repo, pr)
+    for start in range(0, len(unresolved), RESOLVE_BATCH_SIZE):
+        batch = unresolved[start:start + RESOLVE_BATCH_SIZE]
+        _graphql(
+            token,
+            _resolve_threads_mutation(len(batch)),
+            {f"t{i}": thread_id for i, thread_id in enumerate(batch)},
+        )
+    resolved = len(unresolved)
     if resolved:
         logger.info("Resolved %d review threads on %s/%s#%d", resolved, owner, repo, pr)
     return resolved
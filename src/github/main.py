@@ -1,13 +1,21 @@
 import asyncio
-import hashlib
+import fcntl
 import hmac
-import json
 import logging
+import os
+import string
+import sys
+from collections.abc import AsyncIterator
+from functools import lru_cache
 from pathlib import Path
 
+import msgspec
+import orjson
 from fastapi import FastAPI, Header, HTTPException, Request
 
 from .config import settings
+from .events import Label, decode_event
+from .reviewer import checkout_name, terminate
 
 PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -18,28 +26,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
 app = FastAPI(title="Agent Fedor — PR Reviewer")
 
 AGENT_PROMPT = """\
 You are Agent Fedor (gcs-fedor[bot]), an automated code reviewer.
 
-Repository: {repo}
-Pull Request: #{pr}
-Trigger: {trigger}
+Repository: $repo
+Pull Request: #$pr
+Trigger: $trigger
 
-Clone directory (absolute): {clone_dir}
-After `just review` runs, the cloned code is available at {clone_dir}/<first-12-chars-of-head-sha>/. Use the Read and Glob tools to inspect files there — do NOT use bash commands like `cd`, `ls`, `git`, `cat`, or `head` to read files.
+Clone directory (absolute): $clone_dir
+After `just review` runs, the cloned code is available at $clone_dir/$repo_dir/. Use the Read and Glob tools to inspect files there — do NOT use bash commands like `cd`, `ls`, `git`, `cat`, or `head` to read files.
 
 Available commands:
 
-  just comments {repo} {pr}                                            — show existing PR issue comments
-  just review-comments {repo} {pr}                                     — show review threads (inline code comments) with status, paths, and comment IDs
-  just review {repo} {pr}                                              — clone the PR, run code review, return the result (does NOT post anything)
-  just comment {repo} {pr} "<message>"                                 — post an issue comment on the PR
-  just reply-comment {repo} {pr} <comment_id> "<message>"              — reply to a specific review thread (use comment IDs from `review-comments`)
-  just submit-review {repo} {pr} <EVENT> '<json>'                      — submit a review with inline comments; EVENT is COMMENT or REQUEST_CHANGES
-                                                                         json format: {{"body":"summary","comments":[{{"path":"file.py","line":10,"body":"issue"}}]}}
-  just approve {repo} {pr} "<message>"                                 — approve the PR (auto-resolves all review threads first)
+  just comments $repo $pr                                            — show existing PR issue comments
+  just review-comments $repo $pr                                     — show review threads (inline code comments) with status, paths, and comment IDs
+  just review $repo $pr                                              — clone the PR, run code review, return the result (does NOT post anything)
+  just comment $repo $pr "<message>"                                 — post an issue comment on the PR
+  just reply-comment $repo $pr <comment_id> "<message>"              — reply to a specific review thread (use comment IDs from `review-comments`)
+  just submit-review $repo $pr <EVENT> '<json>'                      — submit a review with inline comments; EVENT is COMMENT or REQUEST_CHANGES
+                                                                       json format: {"body":"summary","comments":[{"path":"file.py","line":10,"body":"issue"}]}
+  just approve $repo $pr "<message>"                                 — approve the PR (auto-resolves all review threads first)
 
 Rules:
 - Comments from "gcs-fedor[bot]" are YOUR OWN previous comments — do not treat them as developer feedback.
@@ -50,142 +59,264 @@ Rules:
 - You MUST always post your results to the PR using the `just` commands. Printing text to stdout does nothing — nobody reads it. The ONLY way to communicate is through the PR.
 - Every run MUST end with either `just submit-review`, `just approve`, or `just comment` — never with plain text output.
 - CRITICAL: All `just` commands MUST be a SINGLE LINE. Never use literal newlines inside command arguments. Use \\n for line breaks in messages (e.g., `just comment repo 123 "Line one\\nLine two"`). Multi-line commands will be silently rejected.
-- NEVER use bash for file operations — no `cd`, `ls`, `cat`, `head`, `git show`, `git diff`, or any other shell commands to read files. Use the Read tool (with absolute paths under {clone_dir}/) and Glob tool to inspect source code. The ONLY allowed bash usage is `just` commands.
+- NEVER use bash for file operations — no `cd`, `ls`, `cat`, `head`, `git show`, `git diff`, or any other shell commands to read files. Use the Read tool (with absolute paths under $clone_dir/) and Glob tool to inspect source code. The ONLY allowed bash usage is `just` commands.
 
 Your task:
-1. Run `just comments {repo} {pr}` and `just review-comments {repo} {pr}` to read existing comments, review threads, and developer feedback.
+1. Run `just comments $repo $pr` and `just review-comments $repo $pr` to read existing comments, review threads, and developer feedback.
 2. Decide what to do based on the trigger and context:
    - If this is a new PR or new commits:
-     a. Run `just review {repo} {pr}` to get the code review.
+     a. Run `just review $repo $pr` to get the code review.
      b. If there are issues, submit a review with inline comments:
-        `just submit-review {repo} {pr} COMMENT '<json>'`
-        or `just submit-review {repo} {pr} REQUEST_CHANGES '<json>'` for blocking issues.
+        `just submit-review $repo $pr COMMENT '<json>'`
+        or `just submit-review $repo $pr REQUEST_CHANGES '<json>'` for blocking issues.
      c. If the code is clean, approve with a summary message:
-        `just approve {repo} {pr} "LGTM — summary of what looks good"`
+        `just approve $repo $pr "LGTM — summary of what looks good"`
    - If this is a developer comment in a review thread:
-     a. Read the thread context via `just review-comments {repo} {pr}`.
-     b. Reply directly in the thread using `just reply-comment {repo} {pr} <comment_id> "<response>"`.
-     c. If all concerns are addressed, approve with `just approve {repo} {pr} "All concerns resolved"`.
+     a. Read the thread context via `just review-comments $repo $pr`.
+     b. Reply directly in the thread using `just reply-comment $repo $pr <comment_id> "<response>"`.
+     c. If all concerns are addressed, approve with `just approve $repo $pr "All concerns resolved"`.
    - If this is a developer issue comment — read what they asked for and respond appropriately.
 3. Prefer inline review comments (`submit-review`) over issue comments (`comment`) for code-specific feedback.
-4. If the code is ready — run `just approve {repo} {pr} "<summary>"` immediately. This resolves all open threads.
+4. If the code is ready — run `just approve $repo $pr "<summary>"` immediately. This resolves all open threads.
 5. If there are real blocking issues — do NOT approve; your review comments are enough.
 """
 
+_CLONE_DIR = str(settings.clone_dir.resolve())
+# clone_dir is fixed for the process and repo is fixed per cache entry, so
+# each review only substitutes the PR-specific fields.
+_PROMPT_TEMPLATE = string.Template(
+    string.Template(AGENT_PROMPT).safe_substitute(clone_dir=_CLONE_DIR)
+)
+
+
+@lru_cache(maxsize=256)
+def _repo_prompt(repo: str) -> string.Template:
+    return string.Template(_PROMPT_TEMPLATE.safe_substitute(repo=repo))
 
-def _extract_tool_result_text(content: object) -> str:
-    """Extract text from a tool_result content field (string or list of blocks)."""
+
+def _extract_tool_result_text(content: object, limit: int = 500) -> str:
+    """Extract up to `limit` chars of text from a tool_result content field."""
     if isinstance(content, str):
-        return content
+        return content[:limit]
     if isinstance(content, list):
-        return " ".join(
-            b.get("text", "") for b in content if isinstance(b, dict)
-        )
-    return str(content) if content else ""
+        parts = []
+        size = 0
+        for b in content:
+            if not isinstance(b, dict):
+                continue
+            text = b.get("text", "")
+            parts.append(text)
+            size += len(text) + 1
+            if size > limit:
+                break
+        return " ".join(parts)[:limit]
+    return str(content)[:limit] if content else ""
+
+
+def _log_assistant_event(event: dict, bash_commands: list[str]) -> None:
+    for block in event.get("message", {}).get("content", []):
+        if not isinstance(block, dict):
+            continue
+        btype = block.get("type")
+        if btype == "tool_use":
+            name = block.get("name", "?")
+            inp = block.get("input", {})
+            if name == "Bash" and isinstance(inp, dict):
+                cmd = inp.get("command", "")
+                if cmd:
+                    bash_commands.append(cmd)
+                    if logger.isEnabledFor(logging.INFO):
+                        logger.info("[bash] %s", cmd[:500].replace("\n", "\\n")[:500])
+            else:
+                logger.info("[tool] %s", name)
+        elif btype == "text":
+            text = block.get("text", "").strip()
+            if text:
+                logger.info("[text] %s", text[:300])
+
+
+def _log_user_event(event: dict, bash_commands: list[str]) -> None:
+    debug = logger.isEnabledFor(logging.DEBUG)
+    for block in event.get("message", {}).get("content", []):
+        if not isinstance(block, dict) or block.get("type") != "tool_result":
+            continue
+        if block.get("is_error"):
+            text = _extract_tool_result_text(block.get("content", ""), 500)
+            logger.warning("[tool_error] %s", text)
+        elif debug:
+            text = _extract_tool_result_text(block.get("content", ""), 200)
+            if text:
+                logger.debug("[tool_ok] %s", text)
+
+
+def _log_result_event(event: dict, bash_commands: list[str]) -> None:
+    cost = event.get("total_cost_usd")
+    turns = event.get("num_turns")
+    duration = event.get("duration_ms")
+    is_error = event.get("is_error", False)
+    logger.info(
+        "[done] cost=$%.4f turns=%s duration=%.1fs error=%s",
+        cost or 0, turns, (duration or 0) / 1000, is_error,
+    )
+    if is_error:
+        logger.error("[error] %s", event.get("result", "")[:500])
+    for denial in event.get("permission_denials", []):
+        logger.warning("[denied] %s", denial)
+
+
+_STREAM_EVENT_HANDLERS = {
+    "assistant": _log_assistant_event,
+    "user": _log_user_event,
+    "result": _log_result_event,
+}
 
 
 def _log_stream_event(event: dict, bash_commands: list[str]) -> None:
     """Parse and log a stream-json event from Claude CLI."""
-    etype = event.get("type", "")
-
-    if etype == "assistant":
-        for block in event.get("message", {}).get("content", []):
-            if not isinstance(block, dict):
-                continue
-            btype = block.get("type")
-            if btype == "tool_use":
-                name = block.get("name", "?")
-                inp = block.get("input", {})
-                if name == "Bash" and isinstance(inp, dict):
-                    cmd = inp.get("command", "")
-                    if cmd:
-                        bash_commands.append(cmd)
-                        logger.info("[bash] %s", cmd.replace("\n", "\\n")[:500])
-                else:
-                    logger.info("[tool] %s", name)
-            elif btype == "text":
-                text = block.get("text", "").strip()
-                if text:
-                    logger.info("[text] %s", text[:300])
-
-    elif etype == "user":
-        for block in event.get("message", {}).get("content", []):
-            if not isinstance(block, dict) or block.get("type") != "tool_result":
-                continue
-            text = _extract_tool_result_text(block.get("content", ""))
-            if block.get("is_error"):
-                logger.warning("[tool_error] %s", text[:500])
-            elif text:
-                logger.debug("[tool_ok] %s", text[:200])
-
-    elif etype == "result":
-        cost = event.get("total_cost_usd")
-        turns = event.get("num_turns")
-        duration = event.get("duration_ms")
-        is_error = event.get("is_error", False)
-        logger.info(
-            "[done] cost=$%.4f turns=%s duration=%.1fs error=%s",
-            cost or 0, turns, (duration or 0) / 1000, is_error,
-        )
-        if is_error:
-            logger.error("[error] %s", event.get("result", "")[:500])
-        for denial in event.get("permission_denials", []):
-            logger.warning("[denied] %s", denial)
+    handler = _STREAM_EVENT_HANDLERS.get(event.get("type", ""))
+    if handler:
+        handler(event, bash_commands)
+
+
+_CLAUDE_ARGS = (
+    "--output-format", "stream-json",
+    "--verbose",
+    "--allowedTools", "Bash(just *)",
+    "--allowedTools", f"Read({_CLONE_DIR}/*)",
+    "--allowedTools", f"Glob({_CLONE_DIR}/*)",
+    "--allowedTools", f"Grep({_CLONE_DIR}/*)",
+)
 
 
-async def _handle_pr(repo_full_name: str, pr_number: int, trigger: str) -> None:
+def _log_stream_line(line: bytes | bytearray, bash_commands: list[str]) -> None:
+    line = line.strip()
+    if not line:
+        return
     try:
-        logger.info("Handling %s for %s#%d", trigger, repo_full_name, pr_number)
-
-        clone_dir = settings.clone_dir.resolve()
-        prompt = AGENT_PROMPT.format(
-            repo=repo_full_name, pr=pr_number, trigger=trigger,
-            clone_dir=clone_dir,
+        event = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        event = None
+    # Only JSON objects are stream events; anything else is logged as text.
+    if not isinstance(event, dict):
+        logger.info("[claude] %s", line[:500].decode(errors="replace"))
+        return
+    _log_stream_event(event, bash_commands)
+
+
+# Claude's output is read in large chunks and split into lines locally; the
+# reader may buffer up to STREAM_LIMIT before pausing the pipe.
+READ_CHUNK_SIZE = 64 * 1024
+STREAM_LIMIT = 1024 * 1024
+
+
+async def _read_lines(reader: asyncio.StreamReader) -> AsyncIterator[list[bytearray]]:
+    """Yield the complete lines available after each chunked read."""
+    buf = bytearray()
+    while chunk := await reader.read(READ_CHUNK_SIZE):
+        # Only the new chunk can hold a newline: everything before it in buf
+        # is an unterminated line.
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            buf += chunk
+            continue
+        buf += chunk[:end]
+        lines = buf.split(b"\n")
+        buf = bytearray(chunk[end + 1:])
+        yield lines
+    if buf:
+        yield [buf]
+
+
+# Kernel buffer for Claude's stdout pipe on Linux (default is 64 KiB), so
+# bursts of events are drained in fewer, larger reads.
+PIPE_SIZE = 1024 * 1024
+
+
+async def _spawn_claude(
+    cmd: list[str],
+) -> tuple[asyncio.subprocess.Process, asyncio.StreamReader]:
+    """Start Claude CLI, returning the process and a reader for its stdout."""
+    if sys.platform != "linux":
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=PROJECT_DIR,
+            limit=STREAM_LIMIT,
         )
-        cmd = [
-            settings.claude_command,
-            "-p", prompt,
-            "--output-format", "stream-json",
-            "--verbose",
-            "--allowedTools", "Bash(just *)",
-            "--allowedTools", f"Read({clone_dir}/*)",
-            "--allowedTools", f"Glob({clone_dir}/*)",
-            "--allowedTools", f"Grep({clone_dir}/*)",
-        ]
+        assert proc.stdout
+        return proc, proc.stdout
 
+    read_fd, write_fd = os.pipe()
+    try:
+        fcntl.fcntl(write_fd, fcntl.F_SETPIPE_SZ, PIPE_SIZE)
+    except OSError:
+        pass  # above fs.pipe-max-size; keep the default buffer
+    try:
         proc = await asyncio.create_subprocess_exec(
             *cmd,
-            stdout=asyncio.subprocess.PIPE,
+            stdout=write_fd,
             stderr=asyncio.subprocess.PIPE,
             cwd=PROJECT_DIR,
+            limit=STREAM_LIMIT,
         )
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+
+    reader = asyncio.StreamReader(limit=STREAM_LIMIT)
+    await asyncio.get_running_loop().connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader),
+        os.fdopen(read_fd, "rb", buffering=0),
+    )
+    return proc, reader
+
+
+# Webhook bursts (e.g. a rebase of many branches) queue here instead of
+# spawning one Claude process per PR at once.
+_REVIEW_SEM = asyncio.Semaphore(settings.max_concurrent_reviews)
+
+
+async def _handle_pr(repo_full_name: str, pr_number: int, trigger: str) -> None:
+    async with _REVIEW_SEM:
+        await _run_pr_review(repo_full_name, pr_number, trigger)
+
+
+async def _run_pr_review(repo_full_name: str, pr_number: int, trigger: str) -> None:
+    proc: asyncio.subprocess.Process | None = None
+    try:
+        logger.info("Handling %s for %s#%d", trigger, repo_full_name, pr_number)
+
+        prompt = _repo_prompt(repo_full_name).substitute(
+            pr=pr_number, trigger=trigger,
+            repo_dir=checkout_name(repo_full_name, pr_number),
+        )
+        cmd = [settings.claude_command, "-p", prompt, *_CLAUDE_ARGS]
+
+        proc, stdout = await _spawn_claude(cmd)
 
         bash_commands: list[str] = []
 
         async def _stream_stdout():
-            assert proc.stdout
-            async for raw in proc.stdout:
-                line = raw.decode(errors="replace").rstrip()
-                if not line:
-                    continue
-                try:
-                    event = json.loads(line)
-                except json.JSONDecodeError:
-                    logger.info("[claude] %s", line[:500])
-                    continue
-                _log_stream_event(event, bash_commands)
+            async for lines in _read_lines(stdout):
+                for line in lines:
+                    _log_stream_line(line, bash_commands)
 
         async def _stream_stderr():
             assert proc.stderr
-            async for raw in proc.stderr:
-                line = raw.decode(errors="replace").rstrip()
-                if line:
-                    logger.warning("[claude:stderr] %s", line[:500])
-
-        await asyncio.wait_for(
-            asyncio.gather(_stream_stdout(), _stream_stderr(), proc.wait()),
-            timeout=600,
-        )
+            async for lines in _read_lines(proc.stderr):
+                for line in lines:
+                    line = line.rstrip()
+                    if line:
+                        logger.warning("[claude:stderr] %s", line[:500].decode(errors="replace"))
+
+        async with asyncio.timeout(600):
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(_stream_stdout())
+                tg.create_task(_stream_stderr())
+                tg.create_task(proc.wait())
 
         if proc.returncode != 0:
             logger.error("Claude exited with code %d for %s#%d", proc.returncode, repo_full_name, pr_number)
@@ -193,43 +324,80 @@ async def _handle_pr(repo_full_name: str, pr_number: int, trigger: str) -> None:
             logger.warning("Claude ran no commands for %s#%d — review likely not posted", repo_full_name, pr_number)
         else:
             logger.info("Review completed for %s#%d — ran %d commands", repo_full_name, pr_number, len(bash_commands))
-    except asyncio.TimeoutError:
+    except TimeoutError:
         logger.error("Claude timed out for %s#%d", repo_full_name, pr_number)
-        proc.kill()
     except Exception:
         logger.exception("Review failed for %s#%d", repo_full_name, pr_number)
+    finally:
+        # Whatever ended the review, Claude must not outlive it: nothing reads
+        # its pipes any more, and the next review reuses the same checkout.
+        if proc is not None and proc.returncode is None:
+            await terminate(proc)
 
 
 BOT_LOGIN = "gcs-fedor[bot]"
 
 
-def _has_required_label(labels: list[dict]) -> bool:
-    """Check if PR has the required label. If no label configured, allow all."""
-    if not settings.github_pr_label:
-        return True
-    return any(l["name"] == settings.github_pr_label for l in labels)
+_REQUIRED_LABELS = settings.required_labels
+
+
+def _has_required_label(labels: list[Label]) -> bool:
+    """Check if PR has any required label. If no label configured, allow all."""
+    return not _REQUIRED_LABELS or not _REQUIRED_LABELS.isdisjoint(
+        l.name for l in labels
+    )
 
-# key: "owner/repo#123" → pending asyncio.Task
-_pending: dict[str, asyncio.Task] = {}
+# (repo full name, PR number) → pending debounce timer
+_pending: dict[tuple[str, int], asyncio.TimerHandle] = {}
+# Reviews started by a debounce timer, referenced so they aren't GC'd mid-run.
+_running: set[asyncio.Task] = set()
+# PRs with a review in progress; their checkout must not be reset under it.
+_reviewing: set[tuple[str, int]] = set()
+# How often a fired timer re-checks whether that earlier review has finished.
+BUSY_RETRY_DELAY = 30
 
 
 def _schedule_pr(repo_full_name: str, pr_number: int, trigger: str) -> None:
     """Debounce: cancel previous timer for this PR, start a new one."""
-    key = f"{repo_full_name}#{pr_number}"
+    key = (repo_full_name, pr_number)
 
     old = _pending.pop(key, None)
-    if old and not old.done():
+    if old:
         old.cancel()
-        logger.info("Debounce: reset timer for %s", key)
-
-    async def _delayed():
-        delay = settings.webhook_delay
-        logger.info("Waiting %ds before handling %s (%s)", delay, key, trigger)
-        await asyncio.sleep(delay)
-        _pending.pop(key, None)
-        await _handle_pr(repo_full_name, pr_number, trigger)
-
-    _pending[key] = asyncio.create_task(_delayed())
+        logger.info("Debounce: reset timer for %s#%d", repo_full_name, pr_number)
+
+    loop = asyncio.get_running_loop()
+    delay = settings.webhook_delay
+
+    def _fire() -> None:
+        if key in _reviewing:
+            # The agent may still be reading this PR's checkout; wait for it.
+            logger.info(
+                "Review of %s#%d still running, retrying in %ds",
+                repo_full_name, pr_number, BUSY_RETRY_DELAY,
+            )
+            _pending[key] = loop.call_later(BUSY_RETRY_DELAY, _fire)
+            return
+        del _pending[key]
+        _reviewing.add(key)
+        task = asyncio.create_task(_handle_pr(repo_full_name, pr_number, trigger))
+        _running.add(task)
+        task.add_done_callback(_running.discard)
+        task.add_done_callback(lambda _: _reviewing.discard(key))
+
+    logger.info(
+        "Waiting %ds before handling %s#%d (%s)", delay, repo_full_name, pr_number, trigger
+    )
+    _pending[key] = loop.call_later(delay, _fire)
+
+
+# event -> actions we act on; other events are ignored before reading the body
+_HANDLED_EVENTS = {
+    "pull_request": frozenset({"opened", "synchronize", "labeled"}),
+    "pull_request_review_comment": frozenset({"created"}),
+    "pull_request_review": frozenset({"submitted"}),
+    "issue_comment": frozenset({"created"}),
+}
 
 
 @app.post("/webhook")
@@ -238,18 +406,28 @@ async def webhook(
     x_hub_signature_256: str = Header(...),
     x_github_event: str = Header(...),
 ) -> dict:
+    handled_actions = _HANDLED_EVENTS.get(x_github_event)
+    if handled_actions is None:
+        logger.info("Ignored event: %s", x_github_event)
+        return {"status": "ignored", "reason": x_github_event}
+
     payload = await request.body()
     _verify_signature(payload, x_hub_signature_256)
 
-    data = await request.json()
-    action = data.get("action")
-
-    if x_github_event == "pull_request" and action in ("opened", "synchronize", "labeled"):
-        repo = data["repository"]
-        pr = data["pull_request"]
-
-        if not _has_required_label(pr.get("labels", [])):
-            logger.info("Ignored PR #%d: missing required label %r", pr["number"], settings.github_pr_label)
+    try:
+        event = decode_event(payload)
+    except msgspec.DecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    action = event.action
+    if action not in handled_actions:
+        logger.info("Ignored event: %s/%s", x_github_event, action)
+        return {"status": "ignored", "reason": f"{x_github_event}/{action}"}
+
+    if x_github_event == "pull_request":
+        pr = event.pull_request
+
+        if not _has_required_label(pr.labels):
+            logger.info("Ignored PR #%d: missing required label %r", pr.number, settings.github_pr_label)
             return {"status": "ignored", "reason": "missing required label"}
 
         if action == "opened":
@@ -259,28 +437,26 @@ async def webhook(
         else:
             trigger = "label added"
 
-        _schedule_pr(repo["full_name"], pr["number"], trigger)
-        return {"status": "ok", "pr": pr["number"]}
+        _schedule_pr(event.repository.full_name, pr.number, trigger)
+        return {"status": "ok", "pr": pr.number}
 
-    if x_github_event == "pull_request_review_comment" and action == "created":
-        sender = data["comment"]["user"]["login"]
+    if x_github_event == "pull_request_review_comment":
+        sender = event.comment.user.login
         if sender == BOT_LOGIN:
             logger.info("Ignored own review comment on PR")
             return {"status": "ignored", "reason": "own review comment"}
 
-        if not _has_required_label(data["pull_request"].get("labels", [])):
+        if not _has_required_label(event.pull_request.labels):
             logger.info("Ignored review comment: PR missing required label %r", settings.github_pr_label)
             return {"status": "ignored", "reason": "missing required label"}
 
-        repo = data["repository"]
-        pr_number = data["pull_request"]["number"]
-        _schedule_pr(repo["full_name"], pr_number, f"review comment from @{sender}")
+        pr_number = event.pull_request.number
+        _schedule_pr(event.repository.full_name, pr_number, f"review comment from @{sender}")
         return {"status": "ok", "pr": pr_number}
 
-    if x_github_event == "pull_request_review" and action == "submitted":
-        review = data["review"]
-        sender = review["user"]["login"]
-        state = review.get("state", "")
+    if x_github_event == "pull_request_review":
+        sender = event.review.user.login
+        state = event.review.state
 
         if sender == BOT_LOGIN:
             logger.info("Ignored own review on PR")
@@ -290,47 +466,49 @@ async def webhook(
             logger.info("Ignored review with state %r from @%s", state, sender)
             return {"status": "ignored", "reason": f"review state: {state}"}
 
-        if not _has_required_label(data["pull_request"].get("labels", [])):
+        if not _has_required_label(event.pull_request.labels):
             logger.info("Ignored review: PR missing required label %r", settings.github_pr_label)
             return {"status": "ignored", "reason": "missing required label"}
 
-        repo = data["repository"]
-        pr_number = data["pull_request"]["number"]
-        _schedule_pr(repo["full_name"], pr_number, f"review (comment) from @{sender}")
+        pr_number = event.pull_request.number
+        _schedule_pr(event.repository.full_name, pr_number, f"review (comment) from @{sender}")
         return {"status": "ok", "pr": pr_number}
 
-    if x_github_event == "issue_comment" and action == "created":
-        # Only handle comments on PRs (they have a pull_request key)
-        issue = data["issue"]
-        if "pull_request" not in issue:
-            logger.info("Ignored issue_comment on non-PR issue #%d", issue["number"])
-            return {"status": "ignored", "reason": "not a PR comment"}
+    # issue_comment: only handle comments on PRs (they have a pull_request key)
+    issue = event.issue
+    if issue.pull_request is None:
+        logger.info("Ignored issue_comment on non-PR issue #%d", issue.number)
+        return {"status": "ignored", "reason": "not a PR comment"}
 
-        # Ignore our own comments to prevent infinite loops
-        sender = data["comment"]["user"]["login"]
-        if sender == BOT_LOGIN:
-            logger.info("Ignored own comment on #%d", issue["number"])
-            return {"status": "ignored", "reason": "own comment"}
+    # Ignore our own comments to prevent infinite loops
+    sender = event.comment.user.login
+    if sender == BOT_LOGIN:
+        logger.info("Ignored own comment on #%d", issue.number)
+        return {"status": "ignored", "reason": "own comment"}
 
-        if not _has_required_label(issue.get("labels", [])):
-            logger.info("Ignored issue comment: PR #%d missing required label %r", issue["number"], settings.github_pr_label)
-            return {"status": "ignored", "reason": "missing required label"}
+    if not _has_required_label(issue.labels):
+        logger.info("Ignored issue comment: PR #%d missing required label %r", issue.number, settings.github_pr_label)
+        return {"status": "ignored", "reason": "missing required label"}
+
+    _schedule_pr(event.repository.full_name, issue.number, f"comment from @{sender}")
+    return {"status": "ok", "pr": issue.number}
 
-        repo = data["repository"]
-        _schedule_pr(repo["full_name"], issue["number"], f"comment from @{sender}")
-        return {"status": "ok", "pr": issue["number"]}
 
-    logger.info("Ignored event: %s/%s", x_github_event, action)
-    return {"status": "ignored", "reason": f"{x_github_event}/{action}"}
+_SECRET_BYTES = settings.github_webhook_secret.encode()
+_SIGNATURE_PREFIX = "sha256="
+_SIGNATURE_LENGTH = len(_SIGNATURE_PREFIX) + 64
 
 
 def _verify_signature(payload: bytes, signature: str) -> None:
-    expected = "sha256=" + hmac.new(
-        settings.github_webhook_secret.encode(),
-        payload,
-        hashlib.sha256,
-    ).hexdigest()
-    if not hmac.compare_digest(expected, signature):
+    # Reject malformed headers before hashing a possibly large payload.
+    if len(signature) != _SIGNATURE_LENGTH or not signature.startswith(_SIGNATURE_PREFIX):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    try:
+        received = bytes.fromhex(signature[len(_SIGNATURE_PREFIX):])
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    expected = hmac.digest(_SECRET_BYTES, payload, "sha256")
+    if not hmac.compare_digest(expected, received):
         raise HTTPException(status_code=401, detail="Invalid signature")
 
 
@@ -1,6 +1,12 @@
 import asyncio
+import fcntl
 import logging
+import os
 import shutil
+import tempfile
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
 
 from .config import settings
@@ -8,53 +14,164 @@ from .config import settings
 logger = logging.getLogger(__name__)
 
 
-async def run_review(clone_url: str, head_sha: str, token: str) -> str:
+async def run_review(
+    repo_full_name: str, pr: int, clone_url: str, head_sha: str, token: str
+) -> str:
     if settings.dummy_mode:
         logger.info("Dummy mode enabled, skipping real review")
         return "Ponnggg"
 
-    settings.clone_dir.mkdir(parents=True, exist_ok=True)
-    repo_dir = settings.clone_dir / head_sha[:12]
-    if repo_dir.exists():
-        shutil.rmtree(repo_dir)
+    # git worktree runs inside the mirror, so a relative CLONE_DIR would be
+    # resolved against it instead of the process cwd.
+    clone_dir = settings.clone_dir.resolve()
+    slug = repo_slug(repo_full_name)
+    mirrors = clone_dir / "mirrors"
+    await asyncio.to_thread(mirrors.mkdir, parents=True, exist_ok=True)
+
+    mirror = mirrors / f"{slug}.git"
+    name = checkout_name(repo_full_name, pr)
+    repo_dir = clone_dir / name
+    # The checkout lock keeps a re-review of the same PR from resetting the
+    # tree under a running one; the mirror lock is held only while the
+    # shared mirror and its worktree list change.
+    async with _file_lock(mirrors / f"{name}.lock"):
+        with tempfile.TemporaryDirectory(prefix="agent-fedor-") as private_dir:
+            # The token reaches git through the askpass helper's environment,
+            # so it never shows up in argv, the remote URL or the mirror's
+            # config. Claude gets it too: diffing the blobless checkout
+            # fetches missing blobs from origin.
+            env = {
+                **os.environ,
+                "GIT_ASKPASS": str(_write_askpass(Path(private_dir))),
+                "GIT_TOKEN": token,
+                "GIT_TERMINAL_PROMPT": "0",
+            }
+            async with _file_lock(mirrors / f"{slug}.lock"):
+                await _update_mirror(mirror, clone_url, head_sha, env)
+                await _checkout(mirror, head_sha, repo_dir, env)
+            return await _run_claude(repo_dir, env)
+
+
+def repo_slug(repo_full_name: str) -> str:
+    """Directory-safe name for a repository: owner/repo -> owner__repo."""
+    return repo_full_name.replace("/", "__")
+
+
+def checkout_name(repo_full_name: str, pr: int) -> str:
+    """Directory name of a PR's checkout under clone_dir: owner__repo__pr<N>."""
+    return f"{repo_slug(repo_full_name)}__pr{pr}"
+
+
+_ASKPASS_SCRIPT = """\
+#!/bin/sh
+case "$1" in
+    Username*) echo x-access-token ;;
+    *) echo "$GIT_TOKEN" ;;
+esac
+"""
 
-    authenticated_url = clone_url.replace(
-        "https://", f"https://x-access-token:{token}@"
-    )
-    await _clone_repo(authenticated_url, head_sha, repo_dir)
-    return await _run_claude(repo_dir)
 
+def _write_askpass(private_dir: Path) -> Path:
+    # private_dir comes from tempfile (mode 0700, owned by us): a shared
+    # location such as clone_dir under /tmp could hold a planted script.
+    path = private_dir / "askpass.sh"
+    path.write_text(_ASKPASS_SCRIPT)
+    path.chmod(0o700)
+    return path
 
-async def _clone_repo(url: str, sha: str, dest: Path) -> None:
-    # Clone without checking out, then checkout the exact commit
+
+@asynccontextmanager
+async def _file_lock(path: Path) -> AsyncIterator[None]:
+    # Every `just review` runs in its own process, so an in-process
+    # asyncio.Lock can't keep two reviews off the same mirror or checkout.
+    lock_file = await asyncio.to_thread(open, path, "w")
+    try:
+        await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX)
+        yield
+    finally:
+        lock_file.close()
+
+
+async def _git(
+    *args: str, cwd: Path | None = None, env: dict[str, str] | None = None
+) -> None:
     proc = await asyncio.create_subprocess_exec(
         "git",
-        "clone",
-        "--no-checkout",
-        url,
-        str(dest),
+        *args,
+        cwd=cwd,
+        env=env,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
     )
     _, stderr = await proc.communicate()
     if proc.returncode != 0:
-        raise RuntimeError(f"git clone failed: {stderr.decode()}")
+        raise RuntimeError(f"git {args[0]} failed: {stderr.decode()}")
 
-    proc = await asyncio.create_subprocess_exec(
-        "git",
-        "-C",
-        str(dest),
-        "checkout",
-        sha,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
+
+# History is kept so the review can diff against the base branch; blobs are
+# fetched on demand when the worktree is checked out.
+_PARTIAL_FETCH = ("--filter=blob:none", "--no-tags")
+# A bare clone has no fetch refspec, so branches are updated explicitly to
+# keep the base branch current. They also go to refs/remotes/origin/*, which
+# the checkout shares, so the review can diff against origin/<base> as it
+# could in a regular clone.
+_BRANCHES_REFSPECS = (
+    "+refs/heads/*:refs/heads/*",
+    "+refs/heads/*:refs/remotes/origin/*",
+)
+
+
+async def _update_mirror(
+    mirror: Path, url: str, sha: str, env: dict[str, str]
+) -> None:
+    # One bare mirror per repository; later reviews only fetch the objects
+    # they are missing.
+    if not mirror.exists():
+        await _git("clone", "--bare", *_PARTIAL_FETCH, url, str(mirror), env=env)
+    await _git(
+        "fetch", *_PARTIAL_FETCH, "--prune",
+        "origin", *_BRANCHES_REFSPECS, sha, cwd=mirror, env=env,
     )
-    _, stderr = await proc.communicate()
-    if proc.returncode != 0:
-        raise RuntimeError(f"git checkout {sha} failed: {stderr.decode()}")
+    # Like `git clone`, origin/HEAD is looked up once rather than every fetch.
+    if not (mirror / "refs" / "remotes" / "origin" / "HEAD").exists():
+        await _git("remote", "set-head", "origin", "--auto", cwd=mirror, env=env)
+
+
+async def _checkout(mirror: Path, sha: str, dest: Path, env: dict[str, str]) -> None:
+    # The checkout is kept per PR; later reviews only move it to the new
+    # commit and drop whatever the previous run left behind.
+    if (dest / ".git").exists():
+        try:
+            # Blobs are fetched lazily from the mirror's remote, which needs auth.
+            await _git("reset", "--hard", sha, cwd=dest, env=env)
+            await _git("clean", "-fdx", cwd=dest)
+            return
+        except RuntimeError:
+            # e.g. the mirror was recreated and the worktree's gitdir is gone.
+            logger.warning("Checkout %s is unusable, recreating it", dest.name)
 
+    # A broken leftover tree can hold thousands of files; remove it off the
+    # event loop.
+    await asyncio.to_thread(shutil.rmtree, dest, ignore_errors=True)
+    await _git("worktree", "prune", cwd=mirror)
+    await _git("worktree", "add", "--detach", str(dest), sha, cwd=mirror, env=env)
 
-async def _run_claude(repo_dir: Path) -> str:
+
+async def terminate(proc: asyncio.subprocess.Process) -> None:
+    """Kill a subprocess and reap it so it doesn't linger as a zombie."""
+    with suppress(ProcessLookupError):
+        proc.kill()
+    with suppress(TimeoutError):
+        await asyncio.wait_for(proc.wait(), timeout=5)
+
+
+# Only the end of Claude's stderr is kept for error reports; long runs can
+# write megabytes of progress output there.
+STDERR_TAIL_LINES = 200
+STDERR_LINE_LIMIT = 1000
+
+
+async def _run_claude(repo_dir: Path, env: dict[str, str]) -> str:
     prompt = "Please run code review skill."
 
     proc = await asyncio.create_subprocess_exec(
@@ -64,13 +181,37 @@ async def _run_claude(repo_dir: Path) -> str:
         "--output-format",
         "text",
         cwd=str(repo_dir),
+        env=env,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
     )
-    stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=300)
+    assert proc.stdout and proc.stderr
+    stderr_tail: deque[bytes] = deque(maxlen=STDERR_TAIL_LINES)
+
+    async def _drain_stderr() -> None:
+        # The unterminated end of each read is carried into the next one;
+        # it is truncated too, so a huge line can't grow without bound.
+        partial = b""
+        while chunk := await proc.stderr.read(64 * 1024):
+            *lines, partial = (partial + chunk).split(b"\n")
+            partial = partial[:STDERR_LINE_LIMIT]
+            stderr_tail.extend(line[:STDERR_LINE_LIMIT] for line in lines)
+        if partial:
+            stderr_tail.append(partial)
+
+    try:
+        async with asyncio.timeout(300):
+            async with asyncio.TaskGroup() as tg:
+                stdout_task = tg.create_task(proc.stdout.read())
+                tg.create_task(_drain_stderr())
+                tg.create_task(proc.wait())
+    except TimeoutError:
+        await terminate(proc)
+        raise
 
     if proc.returncode != 0:
-        logger.error("claude failed: %s", stderr.decode())
-        raise RuntimeError(f"Claude CLI failed: {stderr.decode()}")
+        stderr = b"\n".join(stderr_tail).decode(errors="replace")
+        logger.error("claude failed: %s", stderr)
+        raise RuntimeError(f"Claude CLI failed: {stderr}")
 
-    return stdout.decode()
+    return stdout_task.result().decode()